@@ -0,0 +1,23 @@
+"""
+Lucida Flow API Metrics
+Prometheus metrics for the API server
+
+Kept out of api_server.py so they are registered once per process, even
+when `python api_server.py` loads the server both as __main__ and as the
+api_server module uvicorn imports.
+"""
+
+from prometheus_client import Counter, Histogram
+
+CACHE_HITS = Counter(
+    "lucida_cache_hits_total", "Responses served from the Redis cache", ["endpoint"]
+)
+CACHE_MISSES = Counter(
+    "lucida_cache_misses_total", "Cache lookups that went upstream", ["endpoint"]
+)
+UPSTREAM_LATENCY = Histogram(
+    "lucida_upstream_seconds",
+    "Time spent in blocking LucidaClient calls",
+    ["operation"],
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
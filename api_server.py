@@ -3,22 +3,160 @@ Lucida Flow API Server
 FastAPI REST API for Lucida.to music downloads
 """
 
-from fastapi import FastAPI, HTTPException, Response
+from fastapi import FastAPI, HTTPException, Response, Header
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, HttpUrl
-from typing import Optional, List
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from prometheus_fastapi_instrumentator import Instrumentator
+from pydantic import BaseModel, ConfigDict, HttpUrl
+from typing import Optional, List, Tuple, Dict
+from contextlib import asynccontextmanager
 import os
+import asyncio
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import orjson
+import hashlib
+import re
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
 from dotenv import load_dotenv
 from lucida_client import LucidaClient
+from api_metrics import CACHE_HITS, CACHE_MISSES, UPSTREAM_LATENCY
 import uvicorn
 
 # Load environment variables
 load_dotenv()
 
+# Worker threads for blocking search/info calls
+LOOKUP_WORKERS = int(os.getenv("API_LOOKUP_WORKERS", 32))
+
+# Browser downloads allowed to run at the same time
+MAX_DOWNLOADS = int(os.getenv("API_MAX_DOWNLOADS", 4))
+
+# Free tmpfs space needed per concurrent download (hi-res FLAC runs ~200 MB)
+SHM_BYTES_PER_DOWNLOAD = 256 * 1024 * 1024
+
+
+def default_download_tmp_dir() -> str:
+    """
+    Pick the scratch directory for /download-file
+
+    Uses RAM-backed /dev/shm when it can hold MAX_DOWNLOADS tracks at once;
+    Docker only gives containers 64 MiB there unless started with --shm-size,
+    so otherwise fall back to the regular temp directory.
+    """
+    try:
+        shm_free = shutil.disk_usage("/dev/shm").free
+    except OSError:
+        shm_free = 0
+    if shm_free >= MAX_DOWNLOADS * SHM_BYTES_PER_DOWNLOAD:
+        return "/dev/shm/lucida"
+    return os.path.join(tempfile.gettempdir(), "lucida")
+
+
+# Scratch space for /download-file
+DOWNLOAD_TMP_DIR = os.getenv("API_DOWNLOAD_TMP_DIR") or default_download_tmp_dir()
+
+# Response cache for read-only endpoints (disabled when REDIS_URL is unset)
+REDIS_URL = os.getenv("REDIS_URL")
+CACHE_TTL_SERVICES = 3600
+CACHE_TTL_INFO = 900
+CACHE_TTL_SEARCH = 300
+
+# How often expired pages are removed from the client's on-disk cache
+CLIENT_CACHE_PRUNE_INTERVAL = 600
+
+# Characters ignored when comparing search queries
+QUERY_NOISE_RE = re.compile(r"[^\w\s]+")
+
+# Marks responses served from the last-good copy during upstream errors
+STALE_FALLBACK_HEADERS = {"X-Cache": "stale-fallback"}
+
+# How long clients may reuse an ETag-validated response without revalidating
+ETAG_MAX_AGE = 300
+
+# Read size used when streaming audio files back to clients. Tracks are
+# tens of MB, so large reads keep the per-chunk Python overhead low.
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Content types for the audio formats Lucida.to serves
+MIME_BY_EXT = {
+    ".flac": "audio/flac",
+    ".mp3": "audio/mpeg",
+    ".m4a": "audio/mp4",
+}
+
+# Responses smaller than this are not worth compressing
+GZIP_MINIMUM_SIZE = 512
+
+# Routes that return already-compressed audio
+UNCOMPRESSED_PATHS = {"/download-file"}
+
+
+class JSONGZipMiddleware(GZipMiddleware):
+    """GZip middleware that passes audio downloads through untouched"""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in UNCOMPRESSED_PATHS:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+class AudioFileResponse(FileResponse):
+    """FileResponse that reads audio files in STREAM_CHUNK_SIZE pieces"""
+
+    chunk_size = STREAM_CHUNK_SIZE
+
+    async def __call__(self, scope, receive, send):
+        # download_file() has already handled or ignored the Range header;
+        # newer Starlette versions would otherwise parse it again here
+        headers = [(k, v) for k, v in scope["headers"] if k != b"range"]
+        await super().__call__(dict(scope, headers=headers), receive, send)
+
+
+async def prune_client_cache(pool: ThreadPoolExecutor):
+    """Periodically drop expired pages from the client's on-disk cache"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(CLIENT_CACHE_PRUNE_INTERVAL)
+        await loop.run_in_executor(pool, lucida_client.prune_cache)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create the worker thread pools, warm the client's connection and start
+    pruning its cache, and release them on shutdown
+    """
+    # Separate pools so a burst of slow downloads can't starve quick lookups
+    app.state.lookup_pool = ThreadPoolExecutor(
+        max_workers=LOOKUP_WORKERS, thread_name_prefix="lookup"
+    )
+    app.state.download_pool = ThreadPoolExecutor(
+        max_workers=MAX_DOWNLOADS, thread_name_prefix="dl"
+    )
+    os.makedirs(DOWNLOAD_TMP_DIR, exist_ok=True)
+    lucida_client.warm_up()
+    pruner = asyncio.ensure_future(prune_client_cache(app.state.lookup_pool))
+    yield
+    pruner.cancel()
+    app.state.lookup_pool.shutdown(wait=False)
+    app.state.download_pool.shutdown(wait=False)
+    if redis_client is not None:
+        await redis_client.aclose()
+
+
 app = FastAPI(
     title="Lucida Flow API",
     description="REST API for downloading music via Lucida.to",
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # CORS middleware
@@ -30,23 +168,238 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress JSON responses
+app.add_middleware(JSONGZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE)
+
+# Request metrics at /metrics
+Instrumentator().instrument(app).expose(app, endpoint="/metrics")
+
 # Global client instance
 lucida_client = LucidaClient()
 
+# Global cache connection
+redis_client = aioredis.from_url(REDIS_URL) if REDIS_URL else None
+
+
+async def run_in_pool(pool: ThreadPoolExecutor, func, *args):
+    """Run a blocking call on one of the API's thread pools"""
+    start = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+    finally:
+        UPSTREAM_LATENCY.labels(func.__name__).observe(time.perf_counter() - start)
+
+
+# Downloads currently running, keyed by (url, output_path, output_dir)
+inflight_downloads: Dict[Tuple[str, Optional[str], Optional[str]], asyncio.Task] = {}
+
+
+async def coalesced_download(
+    url: str, output_path: Optional[str] = None, output_dir: Optional[str] = None
+) -> dict:
+    """
+    Download a track, joining an identical download that is already running
+
+    Concurrent requests for the same destination share one upstream
+    download, and at most MAX_DOWNLOADS run at once.
+    """
+    key = (url, output_path, output_dir)
+    task = inflight_downloads.get(key)
+
+    if task is None:
+        task = asyncio.ensure_future(
+            run_in_pool(
+                app.state.download_pool,
+                lucida_client.download_track,
+                url,
+                output_path,
+                output_dir,
+            )
+        )
+        inflight_downloads[key] = task
+        task.add_done_callback(lambda _: inflight_downloads.pop(key, None))
+
+    # Shielded so one client disconnecting doesn't cancel it for the others
+    return await asyncio.shield(task)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Reduce a search query to a canonical form for cache lookups
+
+    Case, punctuation and word order are dropped, so near-duplicates like
+    "Daft Punk - Get Lucky" and "get lucky daft punk" share a cache entry.
+    """
+    return " ".join(sorted(QUERY_NOISE_RE.sub(" ", query).lower().split()))
+
+
+def cache_key(endpoint: str, body: dict) -> str:
+    """Build the Redis key for an endpoint and request body"""
+    digest = hashlib.sha1(orjson.dumps(body, option=orjson.OPT_SORT_KEYS)).hexdigest()
+    return f"{endpoint}:{digest}"
+
+
+async def cache_get_or_set(endpoint: str, body: dict, ttl: int, fetch):
+    """
+    Return the cached response for an endpoint/body pair, or compute it
+
+    fetch is an async callable that is only awaited on a cache miss.
+    Error responses are never cached, and Redis being unavailable just
+    falls through to fetch. Successful responses are also kept, without
+    a TTL, as the last-good copy used by cache_get_last_good().
+    """
+    if redis_client is None:
+        return await fetch()
+
+    key = cache_key(endpoint, body)
+
+    try:
+        cached = await redis_client.get(key)
+    except RedisError:
+        cached = None
+    if cached is not None:
+        CACHE_HITS.labels(endpoint).inc()
+        return orjson.loads(cached)
+
+    CACHE_MISSES.labels(endpoint).inc()
+    result = await fetch()
+
+    if "error" not in result:
+        payload = orjson.dumps(result)
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.setex(key, ttl, payload)
+                pipe.set(f"last_good:{key}", payload)
+                await pipe.execute()
+        except RedisError:
+            pass
+
+    return result
+
+
+async def cache_get_last_good(endpoint: str, body: dict) -> Optional[dict]:
+    """Return the last successful response for an endpoint/body pair, if any"""
+    if redis_client is None:
+        return None
+
+    try:
+        cached = await redis_client.get(f"last_good:{cache_key(endpoint, body)}")
+    except RedisError:
+        return None
+
+    return orjson.loads(cached) if cached is not None else None
+
+
+def etag_response(
+    payload: dict, if_none_match: Optional[str], headers: Optional[dict] = None
+) -> Response:
+    """
+    Return payload as JSON tagged with an ETag
+
+    Clients that send a matching If-None-Match get an empty 304 instead.
+    """
+    content = orjson.dumps(payload)
+    etag = f'"{hashlib.md5(content).hexdigest()}"'
+    response_headers = {
+        **(headers or {}),
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={ETAG_MAX_AGE}",
+    }
+
+    if if_none_match is not None:
+        client_tags = {tag.strip() for tag in if_none_match.split(",")}
+        if client_tags & {etag, f"W/{etag}", "*"}:
+            return Response(status_code=304, headers=response_headers)
+
+    return Response(
+        content=content, media_type="application/json", headers=response_headers
+    )
+
+
+def iterfile(
+    path: str,
+    start: int = 0,
+    length: Optional[int] = None,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+):
+    """Yield a file's contents (or length bytes from start) in fixed-size chunks"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            chunk = f.read(size)
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+# parse_range_header() result for a range that starts past the end of the file
+RANGE_NOT_SATISFIABLE = (-1, -1)
+
+
+def parse_range_header(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range "bytes=start-end" header into inclusive offsets
+
+    Returns None when the header should be ignored and the whole file sent:
+    an unknown unit, a multi-range request, or a malformed range. Returns
+    RANGE_NOT_SATISFIABLE when the range lies entirely past the end of the
+    file.
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    start_str, sep, end_str = spec.strip().partition("-")
+    if not sep:
+        return None
+
+    try:
+        if start_str:
+            start = int(start_str)
+            end = int(end_str) if end_str else None
+        else:
+            # Suffix range: the last N bytes
+            suffix = int(end_str)
+            if suffix < 0:
+                return None
+            if suffix == 0 or size == 0:
+                return RANGE_NOT_SATISFIABLE
+            return max(size - suffix, 0), size - 1
+    except ValueError:
+        return None
+
+    if start < 0 or (end is not None and end < start):
+        return None
+    if start >= size:
+        return RANGE_NOT_SATISFIABLE
+
+    end = size - 1 if end is None else min(end, size - 1)
+    return start, end
+
 
 # Request/Response Models
-class SearchRequest(BaseModel):
+class RequestModel(BaseModel):
+    """Base for request bodies: reject unknown fields, trim whitespace"""
+
+    model_config = ConfigDict(extra="forbid", str_strip_whitespace=True)
+
+
+class SearchRequest(RequestModel):
     query: str
     service: str
     limit: Optional[int] = 10
 
 
-class TrackInfoRequest(BaseModel):
-    url: str
+class TrackInfoRequest(RequestModel):
+    url: HttpUrl
 
 
-class DownloadRequest(BaseModel):
-    url: str
+class DownloadRequest(RequestModel):
+    url: HttpUrl
     output_path: Optional[str] = None
 
 
@@ -76,14 +429,19 @@ async def health():
     }
 
 
-@app.get("/services")
-async def get_services():
+@app.get("/services", response_model=None)
+async def get_services(if_none_match: Optional[str] = Header(None)):
     """Get list of available streaming services"""
-    services = lucida_client.get_available_services()
-    return {"services": services, "count": len(services)}
+
+    async def fetch():
+        services = lucida_client.get_available_services()
+        return {"services": services, "count": len(services)}
+
+    services = await cache_get_or_set("services", {}, CACHE_TTL_SERVICES, fetch)
+    return etag_response(services, if_none_match)
 
 
-@app.post("/search")
+@app.post("/search", response_model=None)
 async def search(request: SearchRequest):
     """
     Search for music on a specific streaming service
@@ -93,32 +451,64 @@ async def search(request: SearchRequest):
     - **limit**: Maximum number of results (default: 10)
     """
     try:
-        results = lucida_client.search(
-            request.query, service=request.service, limit=request.limit or 10
-        )
+
+        async def fetch():
+            return await run_in_pool(
+                app.state.lookup_pool,
+                lucida_client.search,
+                request.query,
+                request.service,
+                request.limit or 10,
+            )
+
+        body = {
+            "query": normalize_query(request.query),
+            "service": request.service.lower(),
+            "limit": request.limit or 10,
+        }
+        results = await cache_get_or_set("search", body, CACHE_TTL_SEARCH, fetch)
 
         if "error" in results:
+            # Serve the last good result while Lucida.to is failing
+            stale = await cache_get_last_good("search", body)
+            if stale is not None:
+                stale["query"] = request.query
+                return ORJSONResponse(stale, headers=STALE_FALLBACK_HEADERS)
             raise HTTPException(status_code=500, detail=results["error"])
 
-        return results
+        # A cache hit may come from a differently worded query
+        results["query"] = request.query
+        return ORJSONResponse(results)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/info")
-async def get_track_info(request: TrackInfoRequest):
+@app.post("/info", response_model=None)
+async def get_track_info(
+    request: TrackInfoRequest, if_none_match: Optional[str] = Header(None)
+):
     """
     Get detailed information about a track
 
     - **url**: URL to the track (from Tidal, Qobuz, Spotify, etc.)
     """
     try:
-        info = lucida_client.get_track_info(request.url)
+
+        async def fetch():
+            return await run_in_pool(
+                app.state.lookup_pool, lucida_client.get_track_info, str(request.url)
+            )
+
+        body = request.model_dump(mode="json")
+        info = await cache_get_or_set("info", body, CACHE_TTL_INFO, fetch)
 
         if "error" in info:
+            stale = await cache_get_last_good("info", body)
+            if stale is not None:
+                return etag_response(stale, if_none_match, STALE_FALLBACK_HEADERS)
             raise HTTPException(status_code=500, detail=info["error"])
 
-        return info
+        return etag_response(info, if_none_match)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -132,9 +522,7 @@ async def download_track(request: DownloadRequest):
     - **output_path**: Optional output path for the file
     """
     try:
-        result = lucida_client.download_track(
-            request.url, output_path=request.output_path
-        )
+        result = await coalesced_download(str(request.url), request.output_path)
 
         if not result.get("success"):
             raise HTTPException(
@@ -145,22 +533,30 @@ async def download_track(request: DownloadRequest):
             "success": True,
             "filepath": result["filepath"],
             "size": result["size"],
-            "size_mb": round(result["size"] / 1024 / 1024, 2),
+            "size_mb": result["size_mb"],
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/download-file")
-async def download_track_file(request: DownloadRequest):
+async def download_track_file(
+    request: DownloadRequest, range_header: Optional[str] = Header(None, alias="Range")
+):
     """
     Download a track and return the audio file directly
 
     - **url**: URL to the track
+
+    Supports a single `Range: bytes=start-end` header for partial content.
     """
+    # Each request gets its own scratch directory, removed once the
+    # response has been sent
+    tmp_dir = tempfile.mkdtemp(dir=DOWNLOAD_TMP_DIR)
+    cleanup = BackgroundTask(shutil.rmtree, tmp_dir, ignore_errors=True)
+
     try:
-        # Download to temporary location
-        result = lucida_client.download_track(request.url)
+        result = await coalesced_download(str(request.url), output_dir=tmp_dir)
 
         if not result.get("success"):
             raise HTTPException(
@@ -169,36 +565,74 @@ async def download_track_file(request: DownloadRequest):
 
         filepath = result["filepath"]
 
-        # Read file content
-        with open(filepath, "rb") as f:
-            content = f.read()
-
         # Determine content type
-        if filepath.endswith(".flac"):
-            media_type = "audio/flac"
-        elif filepath.endswith(".mp3"):
-            media_type = "audio/mpeg"
-        elif filepath.endswith(".m4a"):
-            media_type = "audio/mp4"
-        else:
-            media_type = "application/octet-stream"
+        media_type = MIME_BY_EXT.get(
+            os.path.splitext(filepath)[1].lower(), "application/octet-stream"
+        )
 
         filename = os.path.basename(filepath)
 
-        return Response(
-            content=content,
+        byte_range = None
+        if range_header is not None:
+            size = os.path.getsize(filepath)
+            byte_range = parse_range_header(range_header, size)
+            if byte_range == RANGE_NOT_SATISFIABLE:
+                return Response(
+                    status_code=416,
+                    headers={"Content-Range": f"bytes */{size}"},
+                    background=cleanup,
+                )
+
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            return StreamingResponse(
+                iterfile(filepath, start, length),
+                status_code=206,
+                media_type=media_type,
+                headers={
+                    "Content-Disposition": f'attachment; filename="{filename}"',
+                    "Accept-Ranges": "bytes",
+                    "Content-Range": f"bytes {start}-{end}/{size}",
+                    "Content-Length": str(length),
+                },
+                background=cleanup,
+            )
+
+        # Ignored ranges fall through to the full file. AudioFileResponse
+        # sends it without buffering it in Python and sets Content-Length /
+        # Content-Disposition itself
+        return AudioFileResponse(
+            filepath,
             media_type=media_type,
-            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+            filename=filename,
+            headers={"Accept-Ranges": "bytes"},
+            background=cleanup,
         )
     except Exception as e:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 if __name__ == "__main__":
     host = os.getenv("API_HOST", "0.0.0.0")
     port = int(os.getenv("API_PORT", 8000))
+    # Each worker has its own LucidaClient and rate limiter
+    workers = int(os.getenv("API_WORKERS", 1))
 
     print(f"Starting Lucida Flow API on {host}:{port}")
     print(f"API Documentation: http://{host}:{port}/docs")
 
-    uvicorn.run(app, host=host, port=port)
+    # Workers > 1 require the app as an import string; a single worker
+    # serves this module's app instead of importing the file a second
+    # time. "auto" picks uvloop wherever it is installed (it is not
+    # available on Windows).
+    uvicorn.run(
+        "api_server:app" if workers > 1 else app,
+        host=host,
+        port=port,
+        loop="auto",
+        http="httptools",
+        workers=workers,
+        access_log=False,
+    )
@@ -5,9 +5,12 @@ Command-line interface for downloading music from Lucida.to
 """
 
 import click
+import logging
 import os
+import threading
 from dotenv import load_dotenv
 from rich.console import Console
+from rich.logging import RichHandler
 from rich.table import Table
 from rich import print as rprint
 from lucida_client import LucidaClient
@@ -17,12 +20,28 @@ load_dotenv()
 
 console = Console()
 
+# Shared client so every command reuses one HTTP session and rate limiter
+_client = None
+
+
+def get_client() -> LucidaClient:
+    """Return the process-wide LucidaClient, creating it on first use"""
+    global _client
+    if _client is None:
+        _client = LucidaClient()
+    return _client
+
 
 @click.group()
 @click.version_option(version="1.0.0")
 def cli():
     """Lucida Flow - Download music from various streaming services via Lucida.to"""
-    pass
+    # Show the client's rate limit waits; other libraries stay at WARNING
+    logging.basicConfig(
+        format="%(message)s",
+        handlers=[RichHandler(console=console, show_time=False, show_path=False)],
+    )
+    logging.getLogger("lucida_client").setLevel(logging.INFO)
 
 
 @cli.command()
@@ -51,8 +70,7 @@ def search(query, service, limit):
     console.print(f"\n[bold cyan]Searching {service} for:[/bold cyan] {query}\n")
 
     with console.status("[bold green]Searching..."):
-        client = LucidaClient()
-        results = client.search(query, service=service, limit=limit)
+        results = get_client().search(query, service=service, limit=limit)
 
     if "error" in results:
         console.print(f"[bold red]Error:[/bold red] {results['error']}")
@@ -90,10 +108,9 @@ def download(url, output):
     """Download a track from URL"""
     console.print(f"\n[bold cyan]Downloading from:[/bold cyan] {url}\n")
 
-    with console.status("[bold green]Preparing download..."):
-        client = LucidaClient()
+    client = get_client()
 
-        # Get track info first
+    def show_track_info():
         info = client.get_track_info(url)
 
         if "error" in info:
@@ -108,14 +125,21 @@ def download(url, output):
                 console.print(f"[bold]Album:[/bold] {info['album']}")
             console.print()
 
+    # The info lookup and the download are independent, so look the track
+    # up in the background and show its details while the download is still
+    # going. The download stays on the main thread so Ctrl-C interrupts it.
+    info_thread = threading.Thread(target=show_track_info, daemon=True)
+
     with console.status("[bold green]Downloading..."):
+        info_thread.start()
         result = client.download_track(url, output)
+        info_thread.join()
 
     if result.get("success"):
         console.print(f"[bold green]✓ Download successful![/bold green]")
         console.print(f"[bold]Saved to:[/bold] {result['filepath']}")
         console.print(
-            f"[bold]Size:[/bold] {result['size']:,} bytes ({result['size'] / 1024 / 1024:.2f} MB)"
+            f"[bold]Size:[/bold] {result['size']:,} bytes ({result['size_mb']:.2f} MB)"
         )
     else:
         console.print(
@@ -130,8 +154,7 @@ def info(url):
     console.print(f"\n[bold cyan]Getting info for:[/bold cyan] {url}\n")
 
     with console.status("[bold green]Fetching information..."):
-        client = LucidaClient()
-        track_info = client.get_track_info(url)
+        track_info = get_client().get_track_info(url)
 
     if "error" in track_info:
         console.print(f"[bold red]Error:[/bold red] {track_info['error']}")
@@ -155,8 +178,7 @@ def services():
     """List available streaming services"""
     console.print("\n[bold cyan]Available Services:[/bold cyan]\n")
 
-    client = LucidaClient()
-    services_list = client.get_available_services()
+    services_list = get_client().get_available_services()
 
     for service in services_list:
         console.print(f"  [green]✓[/green] {service}")
@@ -169,8 +191,7 @@ def stats():
     """Show rate limiter statistics"""
     console.print("\n[bold cyan]Rate Limiter Statistics:[/bold cyan]\n")
 
-    client = LucidaClient()
-    stats = client.get_rate_limit_stats()
+    stats = get_client().get_rate_limit_stats()
 
     table = Table(title="Request Stats")
     table.add_column("Metric", style="cyan")
@@ -4,20 +4,88 @@ Web scraping client for Lucida.to
 """
 
 import requests
-from bs4 import BeautifulSoup
-from typing import Optional, List, Dict, Any
+import requests_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup, SoupStrainer
+from typing import Optional, List, Dict, Any, Iterator, Tuple
 import re
 import os
-from urllib.parse import urljoin, quote
+from urllib.parse import urljoin
 import time
+import random
+import asyncio
+import logging
+import sqlite3
+import threading
 from collections import deque
 from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+logger = logging.getLogger(__name__)
+
+BYTES_PER_MB = 1024 * 1024
+
+# Only the search result cards are needed from the HTML fallback. The class
+# is matched as a whole word because the strainer sees the raw attribute.
+_SEARCH_RESULT_STRAINER = SoupStrainer(
+    "div", class_=re.compile(r"(^|\s)search-result-track(\s|$)")
+)
+
+# Class name patterns for the metadata fields on a track page
+_TITLE_RE = re.compile(r"track.?title|song.?name")
+_ARTIST_RE = re.compile(r"artist")
+_ALBUM_RE = re.compile(r"album")
+
+_USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# Matches the download button on a Lucida.to track page
+_DOWNLOAD_BUTTON_SELECTOR = "button.download-button, button:has-text('download')"
+
+# Streaming services supported by Lucida.to, in display order
+_AVAILABLE_SERVICES = (
+    "tidal",
+    "qobuz",
+    "deezer",
+    "soundcloud",
+    "amazon_music",
+    "yandex_music",
+    "spotify",
+)
+_AVAILABLE_SERVICE_SET = frozenset(_AVAILABLE_SERVICES)
+
+# Map our service names to Lucida.to API service names
+_API_SERVICE_NAMES = {
+    "amazon_music": "amazon",
+    "yandex_music": "yandex",
+}
+
+# Some services don't support US, use service-specific defaults
+_SERVICE_COUNTRIES = {
+    "qobuz": "GB",
+    "deezer": "FR",
+}
+
+
+def _retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds (HTTP dates are ignored)"""
+    if value and value.strip().isdigit():
+        return float(value)
+    return None
+
+
+class _ServerErrorRetry(Retry):
+    """urllib3 Retry that leaves 429 responses to the RateLimiter"""
+
+    # Retry otherwise retries any 429 that carries a Retry-After header
+    RETRY_AFTER_STATUS_CODES = frozenset({503})
 
 
 class RateLimiter:
     """
     Advanced rate limiter with sliding window and exponential backoff.
     Ensures we never exceed Lucida.to's request limits.
+    Safe to share between threads: concurrent callers are serialized.
     """
 
     def __init__(
@@ -30,97 +98,171 @@ class RateLimiter:
         self.requests_per_hour = requests_per_hour
         self.min_delay = min_delay
 
-        # Track request timestamps
-        self.request_times = deque(maxlen=requests_per_hour)
+        # Timestamps of requests inside each sliding window, oldest first.
+        # Expired entries are popped from the left, so both checks are O(1).
+        self.minute_times = deque()
+        self.request_times = deque()
         self.last_request_time = 0
+        self.total_requests = 0
 
         # Exponential backoff for errors
         self.consecutive_errors = 0
         self.max_backoff = 300  # 5 minutes max
+        # Delay requested by the server's last Retry-After header, if any
+        self.retry_after: Optional[float] = None
+
+        # Serialize callers so concurrent threads can't share a slot
+        self._lock = threading.Lock()
+        # Guards the deques; never held while sleeping, so get_stats()
+        # doesn't block behind a waiting caller
+        self._state_lock = threading.Lock()
+        # Queues async_wait() callers on the event loop before they take
+        # _lock, so waiting coroutines don't each tie up a thread. Created
+        # on first use so it binds to the caller's event loop.
+        self._async_lock = None
 
     def wait(self):
         """Wait if necessary to respect rate limits"""
+        with self._lock:
+            for delay in self._delays():
+                time.sleep(delay)
+
+    async def async_wait(self):
+        """Like wait(), but sleeps without blocking the event loop"""
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            # Also take the threading lock, so async callers are serialized
+            # with wait() calls made from worker threads
+            if not self._lock.acquire(blocking=False):
+                loop = asyncio.get_running_loop()
+                acquired = loop.run_in_executor(None, self._lock.acquire)
+                try:
+                    await asyncio.shield(acquired)
+                except asyncio.CancelledError:
+                    # The acquire can't be abandoned once it is running in
+                    # its thread; give the lock back as soon as it lands
+                    acquired.add_done_callback(lambda _: self._lock.release())
+                    raise
+            try:
+                for delay in self._delays():
+                    await asyncio.sleep(delay)
+            finally:
+                self._lock.release()
+
+    def _prune(self, current_time: float):
+        """Drop timestamps that have left the minute and hour windows"""
+        with self._state_lock:
+            one_minute_ago = current_time - 60
+            while self.minute_times and self.minute_times[0] <= one_minute_ago:
+                self.minute_times.popleft()
+
+            one_hour_ago = current_time - 3600
+            while self.request_times and self.request_times[0] <= one_hour_ago:
+                self.request_times.popleft()
+
+    def _delays(self) -> Iterator[float]:
+        """
+        Yield each sleep needed before the next request, then record it
+
+        The caller does the sleeping, so wait() and async_wait() share
+        the same limit logic.
+        """
         current_time = time.time()
 
         # Enforce minimum delay between requests
         time_since_last = current_time - self.last_request_time
         if time_since_last < self.min_delay:
             sleep_time = self.min_delay - time_since_last
-            time.sleep(sleep_time)
+            yield sleep_time
             current_time = time.time()
 
         # Check per-minute limit (sliding window)
-        one_minute_ago = current_time - 60
-        recent_requests = sum(1 for t in self.request_times if t > one_minute_ago)
-        if recent_requests >= self.requests_per_minute:
+        self._prune(current_time)
+        if len(self.minute_times) >= self.requests_per_minute:
             # Calculate wait time until oldest request expires
-            oldest_in_window = min(
-                (t for t in self.request_times if t > one_minute_ago),
-                default=one_minute_ago,
-            )
-            wait_time = 60 - (current_time - oldest_in_window) + 1
-            print(f"Rate limit: waiting {wait_time:.1f}s (per-minute limit)")
-            time.sleep(wait_time)
+            wait_time = 60 - (current_time - self.minute_times[0]) + 1
+            logger.info("Rate limit: waiting %.1fs (per-minute limit)", wait_time)
+            yield wait_time
             current_time = time.time()
 
         # Check per-hour limit
-        one_hour_ago = current_time - 3600
-        hour_requests = sum(1 for t in self.request_times if t > one_hour_ago)
-        if hour_requests >= self.requests_per_hour:
-            oldest_in_hour = min(
-                (t for t in self.request_times if t > one_hour_ago),
-                default=one_hour_ago,
-            )
-            wait_time = 3600 - (current_time - oldest_in_hour) + 1
-            print(f"Rate limit: waiting {wait_time / 60:.1f}m (per-hour limit)")
-            time.sleep(wait_time)
+        self._prune(current_time)
+        if len(self.request_times) >= self.requests_per_hour:
+            wait_time = 3600 - (current_time - self.request_times[0]) + 1
+            logger.info("Rate limit: waiting %.1fm (per-hour limit)", wait_time / 60)
+            yield wait_time
             current_time = time.time()
 
-        # Exponential backoff for consecutive errors
-        if self.consecutive_errors > 0:
+        # Exponential backoff for consecutive errors, unless the server
+        # said how long to wait
+        if self.retry_after is not None:
+            backoff = self.retry_after
+            self.retry_after = None
+            logger.info("Retry-After: waiting %.1fs", backoff)
+            yield backoff
+            current_time = time.time()
+        elif self.consecutive_errors > 0:
             backoff = min(
                 self.min_delay * (2**self.consecutive_errors),
                 self.max_backoff,
             )
-            print(
-                f"Exponential backoff: waiting {backoff:.1f}s "
-                f"(error #{self.consecutive_errors})"
+            # Jitter so clients that failed together don't retry in lockstep
+            backoff = random.uniform(backoff * 0.5, backoff)
+            logger.info(
+                "Exponential backoff: waiting %.1fs (error #%d)",
+                backoff,
+                self.consecutive_errors,
             )
-            time.sleep(backoff)
+            yield backoff
             current_time = time.time()
 
         # Record this request
-        self.request_times.append(current_time)
+        self.record_request(current_time)
+
+    def record_request(self, current_time: Optional[float] = None):
+        """Count a request made without waiting in the limit windows"""
+        if current_time is None:
+            current_time = time.time()
+        with self._state_lock:
+            self.minute_times.append(current_time)
+            self.request_times.append(current_time)
+            self.total_requests += 1
         self.last_request_time = current_time
 
     def record_success(self):
         """Reset error counter on successful request"""
         self.consecutive_errors = 0
+        self.retry_after = None
+
+    def record_error(self, retry_after: Optional[float] = None):
+        """
+        Increment error counter for backoff calculation
 
-    def record_error(self):
-        """Increment error counter for backoff calculation"""
+        Args:
+            retry_after: Seconds the server asked us to wait (Retry-After),
+                used instead of the exponential backoff for the next request
+        """
         self.consecutive_errors += 1
+        self.retry_after = retry_after
 
     def get_stats(self) -> Dict[str, Any]:
         """Get current rate limiter statistics"""
-        current_time = time.time()
-        one_minute_ago = current_time - 60
-        one_hour_ago = current_time - 3600
+        self._prune(time.time())
 
         return {
-            "requests_last_minute": sum(
-                1 for t in self.request_times if t > one_minute_ago
-            ),
-            "requests_last_hour": sum(
-                1 for t in self.request_times if t > one_hour_ago
-            ),
+            "requests_last_minute": len(self.minute_times),
+            "requests_last_hour": len(self.request_times),
             "consecutive_errors": self.consecutive_errors,
-            "total_requests": len(self.request_times),
+            "total_requests": self.total_requests,
         }
 
 
-class LucidaClient:
-    """Client for interacting with Lucida.to"""
+class _LucidaClientBase:
+    """
+    Request building, page parsing and rate limiting shared by
+    LucidaClient and AsyncLucidaClient
+    """
 
     def __init__(
         self,
@@ -131,12 +273,6 @@ class LucidaClient:
     ):
         self.base_url = base_url
         self.timeout = timeout
-        self.session = requests.Session()
-        self.session.headers.update(
-            {
-                "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-            }
-        )
 
         # Initialize advanced rate limiter
         self.rate_limiter = RateLimiter(
@@ -145,124 +281,95 @@ class LucidaClient:
             min_delay=2.0,  # Conservative 2 second minimum delay
         )
 
-    def _rate_limit(self):
-        """Apply rate limiting before making requests"""
-        self.rate_limiter.wait()
-
-    def _handle_response(self, response):
-        """Handle response and update rate limiter state"""
-        if response.status_code == 429:  # Too Many Requests
-            self.rate_limiter.record_error()
-            retry_after = response.headers.get("Retry-After", 60)
-            print(f"Rate limited by server! Waiting {retry_after}s")
-            time.sleep(int(retry_after))
-            raise requests.exceptions.HTTPError("Rate limited")
-        elif response.status_code >= 500:
+    def _record_status(self, status: int, retry_after: Optional[str] = None):
+        """Update the rate limiter from a response's status code"""
+        if status == 429:  # Too Many Requests
+            self.rate_limiter.record_error(_retry_after_seconds(retry_after))
+        elif status >= 500:
             self.rate_limiter.record_error()
         else:
             self.rate_limiter.record_success()
 
-        return response
-
-    def search(self, query: str, service: str, limit: int = 10) -> Dict[str, Any]:
-        """
-        Search for music on Lucida.to
-
-        Args:
-            query: Search query string
-            service: Music service to search (tidal, qobuz, spotify, deezer, etc.)
-            limit: Maximum number of results to return
-
-        Returns:
-            Dictionary containing search results
-        """
-        self._rate_limit()
-
-        # Validate service
-        available_services = self.get_available_services()
-        if service.lower() not in available_services:
-            return {
-                "error": f"Invalid service: {service}. Available: {', '.join(available_services)}",
-                "query": query,
-                "service": service,
-                "tracks": [],
-                "albums": [],
-                "artists": [],
-            }
-
-        try:
-            # Lucida.to search URL format: /search?service=SERVICE&country=COUNTRY&query=QUERY
-            # Build the search URL with proper parameters
-
-            # Map our service names to Lucida.to API service names
-            service_name_map = {
-                "amazon_music": "amazon",
-                "yandex_music": "yandex",
-            }
-            api_service = service_name_map.get(service.lower(), service.lower())
-
-            # Some services don't support US, use service-specific defaults
-            country_map = {
-                "qobuz": "GB",
-                "deezer": "FR",
-            }
-            country = country_map.get(api_service, "US")
-
-            search_params = {
-                "service": api_service,
-                "country": country,
-                "query": query,
-            }
-
-            # Construct URL with query parameters
-            param_string = "&".join(
-                [f"{k}={quote(str(v))}" for k, v in search_params.items()]
-            )
-            search_url = f"{self.base_url}/search?{param_string}"
-
-            response = self.session.get(search_url, timeout=self.timeout)
-            response = self._handle_response(response)
-            response.raise_for_status()
+    def _invalid_service_result(
+        self, query: str, service: str
+    ) -> Optional[Dict[str, Any]]:
+        """Return search()'s error result if service isn't supported"""
+        if service.lower() in _AVAILABLE_SERVICE_SET:
+            return None
 
-            soup = BeautifulSoup(response.content, "html.parser")
+        return {
+            "error": f"Invalid service: {service}. Available: {', '.join(_AVAILABLE_SERVICES)}",
+            "query": query,
+            "service": service,
+            "tracks": [],
+            "albums": [],
+            "artists": [],
+        }
 
-            results = {
-                "query": query,
-                "service": service,
-                "search_url": search_url,
-                "tracks": [],
-                "albums": [],
-                "artists": [],
-            }
+    def _search_result(
+        self, query: str, service: str, search_url: str, content: bytes, limit: int
+    ) -> Dict[str, Any]:
+        """Build search()'s result from a fetched search page"""
+        return {
+            "query": query,
+            "service": service,
+            "search_url": search_url,
+            "tracks": list(self._iter_tracks(content, limit)),
+            "albums": [],
+            "artists": [],
+        }
 
-            # Try to parse from embedded JSON data first (more reliable)
-            json_tracks = self._extract_tracks_from_json(response.content)
-            if json_tracks:
-                results["tracks"] = json_tracks[:limit]
-                return results
+    def _search_error(self, query: str, error: Exception) -> Dict[str, Any]:
+        """Build search()'s result for a failed request"""
+        return {
+            "error": str(error),
+            "query": query,
+            "tracks": [],
+            "albums": [],
+            "artists": [],
+        }
 
-            # Fallback: Parse search results from HTML
-            # Tracks section
-            track_results = soup.find_all("div", class_="search-result-track")
+    def _search_params(self, query: str, service: str) -> Dict[str, str]:
+        """Build the Lucida.to search query parameters"""
+        # Lucida.to search URL format: /search?service=SERVICE&country=COUNTRY&query=QUERY
+        api_service = _API_SERVICE_NAMES.get(service.lower(), service.lower())
+        country = _SERVICE_COUNTRIES.get(api_service, "US")
 
-            for item in track_results[:limit]:
-                track_data = self._parse_track_element(item)
-                if track_data:
-                    results["tracks"].append(track_data)
+        return {
+            "service": api_service,
+            "country": country,
+            "query": query,
+        }
 
-            return results
+    def _iter_tracks(self, html_content: bytes, limit: int) -> Iterator[Dict[str, Any]]:
+        """Yield up to limit tracks from a search page"""
+        # Try to parse from embedded JSON data first (more reliable). An
+        # empty list is a successful search with no results, so the HTML
+        # is only parsed when the JSON is missing or unusable.
+        json_tracks = self._extract_tracks_from_json(html_content)
+        if json_tracks is not None:
+            yield from json_tracks[:limit]
+            return
+
+        # Fallback: Parse search results from HTML
+        soup = BeautifulSoup(html_content, "lxml", parse_only=_SEARCH_RESULT_STRAINER)
+
+        # Tracks section
+        track_results = soup.find_all("div", class_="search-result-track", limit=limit)
+
+        for item in track_results:
+            track_data = self._parse_track_element(item)
+            if track_data:
+                yield track_data
+
+    def _extract_tracks_from_json(
+        self, html_content: bytes
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Extract track data from embedded JSON in the HTML.
 
-        except requests.RequestException as e:
-            return {
-                "error": str(e),
-                "query": query,
-                "tracks": [],
-                "albums": [],
-                "artists": [],
-            }
-
-    def _extract_tracks_from_json(self, html_content: bytes) -> List[Dict[str, Any]]:
-        """Extract track data from embedded JSON in the HTML."""
+        Returns None if the page has no usable search data.
+        """
         try:
             import pyjson5
 
@@ -272,42 +379,13 @@ class LucidaClient:
             # Find the start of the JSON array
             start_idx = html_str.find("const data = [")
             if start_idx == -1:
-                return []
+                return None
 
             start_idx += len("const data = ")
 
-            # Find the matching closing bracket
-            bracket_count = 0
-            in_string = False
-            escape_next = False
-            end_idx = start_idx
-
-            for i in range(start_idx, len(html_str)):
-                char = html_str[i]
-
-                if escape_next:
-                    escape_next = False
-                    continue
-
-                if char == "\\":
-                    escape_next = True
-                    continue
-
-                if char == '"' and not in_string:
-                    in_string = True
-                elif char == '"' and in_string:
-                    in_string = False
-                elif not in_string:
-                    if char == "[" or char == "{":
-                        bracket_count += 1
-                    elif char == "]" or char == "}":
-                        bracket_count -= 1
-                        if bracket_count == 0 and html_str[i : i + 2] == "];":
-                            end_idx = i + 1
-                            break
-
-            json_str = html_str[start_idx:end_idx]
-            data = pyjson5.loads(json_str)
+            # Decode exactly one JSON5 value from the start of the array;
+            # some=True stops there and ignores the rest of the script
+            data = pyjson5.decode(html_str[start_idx:], some=True)
 
             # Navigate to tracks: data[1].data.results.results.tracks
             if len(data) > 1 and isinstance(data[1], dict):
@@ -317,37 +395,31 @@ class LucidaClient:
                 # Check if search was successful
                 if not results.get("success", False):
                     error_msg = results.get("error", "Unknown error")
-                    print(f"Search error: {error_msg}")
-                    return []
+                    logger.warning("Search error: %s", error_msg)
+                    return None
 
                 results_inner = results.get("results", {})
                 tracks = results_inner.get("tracks", [])
 
                 # Convert to our format
-                formatted_tracks = []
-                for track in tracks:
-                    artists_list = track.get("artists", [])
-                    artist_names = ", ".join([a.get("name", "") for a in artists_list])
-
-                    album = track.get("album", {})
-                    album_name = album.get("title", "")
-
-                    formatted_tracks.append(
-                        {
-                            "name": track.get("title", ""),
-                            "artist": artist_names,
-                            "album": album_name,
-                            "url": track.get("url", ""),
-                        }
-                    )
-
-                return formatted_tracks
+                return [
+                    {
+                        "name": track.get("title", ""),
+                        "artist": ", ".join(
+                            a.get("name", "") for a in track.get("artists", ())
+                        ),
+                        "album": (track.get("album") or {}).get("title", ""),
+                        "url": track.get("url", ""),
+                    }
+                    for track in tracks
+                ]
 
-            return []
+            return None
 
         except Exception as e:
-            print(f"Error extracting JSON data: {e}")
-            return []
+            # The HTML fallback still runs, so a traceback isn't useful here
+            logger.warning("Error extracting JSON data: %s", e)
+            return None
 
     def _parse_track_element(self, element) -> Optional[Dict[str, Any]]:
         """Parse a track element from search results."""
@@ -385,84 +457,56 @@ class LucidaClient:
 
             return None
 
-        except Exception as e:
-            print(f"Error parsing track element: {e}")
+        except Exception:
+            logger.exception("Error parsing track element")
             return None
 
-    def get_track_info(self, url: str) -> Dict[str, Any]:
-        """
-        Get detailed information about a track from its URL
-
-        Args:
-            url: URL to the track (from Tidal, Qobuz, etc.)
-
-        Returns:
-            Dictionary containing track information
-        """
-        self._rate_limit()
-
-        try:
-            # Submit URL to Lucida.to
-            response = self.session.get(
-                self.base_url, params={"url": url}, timeout=self.timeout
-            )
-            response.raise_for_status()
+    def _parse_track_info(self, url: str, html_content: bytes) -> Dict[str, Any]:
+        """Extract track metadata from a Lucida.to track page"""
+        soup = BeautifulSoup(html_content, "lxml")
+
+        # Extract track metadata
+        track_info = {
+            "url": url,
+            "name": None,
+            "artist": None,
+            "album": None,
+            "duration": None,
+            "quality": None,
+        }
 
-            soup = BeautifulSoup(response.content, "html.parser")
-
-            # Extract track metadata
-            track_info = {
-                "url": url,
-                "name": None,
-                "artist": None,
-                "album": None,
-                "duration": None,
-                "quality": None,
-            }
-
-            # Parse track details from the page
-            # Adjust selectors based on actual HTML structure
-            title_elem = soup.find(class_=re.compile(r"track.?title|song.?name"))
-            if title_elem:
-                track_info["name"] = title_elem.get_text(strip=True)
+        # Parse track details from the page
+        # Adjust selectors based on actual HTML structure
+        title_elem = soup.find(class_=_TITLE_RE)
+        if title_elem:
+            track_info["name"] = title_elem.get_text(strip=True)
 
-            artist_elem = soup.find(class_=re.compile(r"artist"))
-            if artist_elem:
-                track_info["artist"] = artist_elem.get_text(strip=True)
+        artist_elem = soup.find(class_=_ARTIST_RE)
+        if artist_elem:
+            track_info["artist"] = artist_elem.get_text(strip=True)
 
-            album_elem = soup.find(class_=re.compile(r"album"))
-            if album_elem:
-                track_info["album"] = album_elem.get_text(strip=True)
+        album_elem = soup.find(class_=_ALBUM_RE)
+        if album_elem:
+            track_info["album"] = album_elem.get_text(strip=True)
 
-            return track_info
+        return track_info
 
-        except requests.RequestException as e:
-            return {"error": str(e), "url": url}
-
-    def download_track(
-        self, url: str, output_path: Optional[str] = None
+    def _download_with_browser(
+        self,
+        url: str,
+        output_path: Optional[str] = None,
+        output_dir: Optional[str] = None,
     ) -> Dict[str, Any]:
-        """
-        Download a track from Lucida.to using browser automation
-
-        Args:
-            url: URL to the track (from Tidal, Qobuz, etc.)
-            output_path: Path to save the downloaded file
-
-        Returns:
-            Dictionary containing download result and file path
-        """
+        """Drive a headless browser through the download; not rate limited"""
         from playwright.sync_api import sync_playwright
 
-        self._rate_limit()
-
         try:
             # Set up download directory
             if output_path:
                 download_dir = os.path.dirname(os.path.abspath(output_path))
                 os.makedirs(download_dir, exist_ok=True)
             else:
-                download_dir = os.path.abspath("./downloads")
+                download_dir = os.path.abspath(output_dir or "./downloads")
                 os.makedirs(download_dir, exist_ok=True)
 
             with sync_playwright() as p:
@@ -476,9 +520,8 @@ class LucidaClient:
                 page.goto(lucida_url, wait_until="networkidle", timeout=60000)
 
                 # Wait for the download button to appear
-                page.wait_for_selector(
-                    "button.download-button, button:has-text('download')", timeout=30000
-                )
+                download_button = page.locator(_DOWNLOAD_BUTTON_SELECTOR).first
+                download_button.wait_for(timeout=30000)
 
                 # Set up download handler
                 download_info: Dict[str, Optional[str]] = {"path": None, "error": None}
@@ -504,9 +547,6 @@ class LucidaClient:
                 page.on("download", handle_download)
 
                 # Click the download button
-                download_button = page.locator(
-                    "button.download-button, button:has-text('download')"
-                ).first
                 download_button.click()
 
                 # Wait for download to start
@@ -529,10 +569,12 @@ class LucidaClient:
                     return {"success": False, "error": download_info["error"]}
 
                 if download_info["path"]:
+                    size = os.path.getsize(download_info["path"])
                     return {
                         "success": True,
                         "filepath": download_info["path"],
-                        "size": os.path.getsize(download_info["path"]),
+                        "size": size,
+                        "size_mb": round(size / BYTES_PER_MB, 2),
                     }
                 else:
                     return {
@@ -543,14 +585,231 @@ class LucidaClient:
         except Exception as e:
             return {"success": False, "error": f"Browser automation error: {str(e)}"}
 
+    def get_available_services(self) -> List[str]:
+        """
+        Get list of available streaming services from Lucida.to
+
+        Returns:
+            List of service names
+        """
+        # Based on Lucida.to documentation
+        return list(_AVAILABLE_SERVICES)
+
+    def get_rate_limit_stats(self) -> Dict[str, Any]:
+        """
+        Get current rate limiter statistics
+
+        Returns:
+            Dictionary with rate limit stats and request counts
+        """
+        stats = self.rate_limiter.get_stats()
+        return {
+            **stats,
+            "limits": {
+                "per_minute": self.rate_limiter.requests_per_minute,
+                "per_hour": self.rate_limiter.requests_per_hour,
+                "min_delay_seconds": self.rate_limiter.min_delay,
+            },
+        }
+
+
+class LucidaClient(_LucidaClientBase):
+    """Client for interacting with Lucida.to"""
+
+    def __init__(
+        self,
+        base_url: str = "https://lucida.to",
+        timeout: int = 30,
+        requests_per_minute: int = 30,
+        requests_per_hour: int = 500,
+        cache_expire_after: int = 600,
+    ):
+        super().__init__(base_url, timeout, requests_per_minute, requests_per_hour)
+
+        # Identical GETs within cache_expire_after seconds are answered from
+        # a local cache and do not count against the rate limit
+        self.session = requests_cache.CachedSession(
+            "lucida_cache",
+            use_cache_dir=True,
+            expire_after=cache_expire_after,
+            allowable_methods=("GET",),
+        )
+        self.prune_cache()
+        self.session.headers.update({"User-Agent": _USER_AGENT})
+
+        # Keep connections to Lucida.to open between requests, and let urllib3
+        # retry server errors (immediately, then after 4s and 8s, or as
+        # Retry-After says). 429s are not retried here: the rate limiter
+        # honours their Retry-After before the next request.
+        adapter = HTTPAdapter(
+            pool_connections=50,
+            pool_maxsize=50,
+            max_retries=_ServerErrorRetry(
+                total=3,
+                backoff_factor=2,
+                status_forcelist=[500, 502, 503, 504],
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            ),
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def warm_up(self):
+        """
+        Resolve DNS and open the TLS connection to Lucida.to in the
+        background, so the first search reuses a pooled connection instead
+        of waiting for it. Meant for long-lived clients such as the API
+        server's.
+        """
+        threading.Thread(target=self._warm_up, daemon=True).start()
+
+    def _warm_up(self):
+        """Open a pooled connection to Lucida.to with a cheap HEAD request"""
+        # Not worth waiting for, but it still counts against the limits
+        self.rate_limiter.record_request()
+        try:
+            self.session.head(self.base_url, timeout=5)
+        except Exception:
+            pass
+
+    def _rate_limit(self):
+        """Apply rate limiting before making requests"""
+        self.rate_limiter.wait()
+
+    def _cached_get(self, url: str, **kwargs) -> requests.Response:
+        """GET a page, only applying rate limiting if it is not cached"""
+        try:
+            response = self.session.get(
+                url, timeout=self.timeout, only_if_cached=True, **kwargs
+            )
+            # A cache miss comes back as a synthetic 504 Not Cached response
+            if response.status_code != 504:
+                return response
+
+            self._rate_limit()
+            return self.session.get(url, timeout=self.timeout, **kwargs)
+        except sqlite3.Error as e:
+            # Treat a locked or broken cache database as a miss
+            logger.warning("Response cache unavailable: %s", e)
+            self._rate_limit()
+            # no-store makes requests-cache skip both the read and the write
+            return self.session.get(
+                url,
+                timeout=self.timeout,
+                headers={"Cache-Control": "no-store"},
+                **kwargs,
+            )
+
+    def prune_cache(self):
+        """
+        Delete expired responses from the on-disk cache
+
+        requests-cache never removes them itself, so without this every
+        distinct search and track page stays in the cache file.
+        """
+        try:
+            self.session.cache.delete(expired=True)
+        except sqlite3.Error as e:
+            logger.warning("Could not prune response cache: %s", e)
+
+    def _handle_response(self, response):
+        """Handle response and update rate limiter state"""
+        # Server errors have already been retried by the session's adapter
+        self._record_status(response.status_code, response.headers.get("Retry-After"))
+
+        return response
+
+    def search(self, query: str, service: str, limit: int = 10) -> Dict[str, Any]:
+        """
+        Search for music on Lucida.to
+
+        Args:
+            query: Search query string
+            service: Music service to search (tidal, qobuz, spotify, deezer, etc.)
+            limit: Maximum number of results to return
+
+        Returns:
+            Dictionary containing search results
+        """
+        # Validate service
+        invalid = self._invalid_service_result(query, service)
+        if invalid:
+            return invalid
+
+        try:
+            search_url, response = self._fetch_search_page(query, service)
+            return self._search_result(
+                query, service, search_url, response.content, limit
+            )
+        except requests.RequestException as e:
+            return self._search_error(query, e)
+
+    def _fetch_search_page(
+        self, query: str, service: str
+    ) -> Tuple[str, requests.Response]:
+        """Request the Lucida.to search page, returning its URL and response"""
+        response = self._cached_get(
+            f"{self.base_url}/search", params=self._search_params(query, service)
+        )
+        if not response.from_cache:
+            response = self._handle_response(response)
+        response.raise_for_status()
+
+        return response.url, response
+
+    def get_track_info(self, url: str) -> Dict[str, Any]:
+        """
+        Get detailed information about a track from its URL
+
+        Args:
+            url: URL to the track (from Tidal, Qobuz, etc.)
+
+        Returns:
+            Dictionary containing track information
+        """
+        try:
+            # Submit URL to Lucida.to
+            response = self._cached_get(self.base_url, params={"url": url})
+            response.raise_for_status()
+
+            return self._parse_track_info(url, response.content)
+
+        except requests.RequestException as e:
+            return {"error": str(e), "url": url}
+
+    def download_track(
+        self,
+        url: str,
+        output_path: Optional[str] = None,
+        output_dir: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Download a track from Lucida.to using browser automation
+
+        Args:
+            url: URL to the track (from Tidal, Qobuz, etc.)
+            output_path: Path to save the downloaded file
+            output_dir: Directory to save into under the suggested filename
+                when output_path is not given (default: ./downloads)
+
+        Returns:
+            Dictionary containing download result and file path
+        """
+        self._rate_limit()
+        return self._download_with_browser(url, output_path, output_dir)
+
     def _get_filename_from_response(self, response, url: str) -> str:
         """Extract filename from response headers or generate from URL"""
         # Try Content-Disposition header
         if "Content-Disposition" in response.headers:
-            content_disp = response.headers["Content-Disposition"]
-            filename_match = re.findall(r'filename="(.+)"', content_disp)
-            if filename_match:
-                return filename_match[0]
+            # EmailMessage handles unquoted names and RFC 2231/5987
+            # filename*=UTF-8''... encoding
+            msg = EmailMessage()
+            msg["Content-Disposition"] = response.headers["Content-Disposition"]
+            filename = msg.get_filename()
+            if filename:
+                return filename
 
         # Try to extract from URL
         url_parts = url.rstrip("/").split("/")
@@ -573,37 +832,117 @@ class LucidaClient:
         # Fallback
         return f"download_{int(time.time())}.bin"
 
-    def get_available_services(self) -> List[str]:
+
+class AsyncLucidaClient(_LucidaClientBase):
+    """
+    asyncio counterpart of LucidaClient built on aiohttp
+
+    search(), get_track_info() and download_track() are coroutines: their
+    rate-limit waits and HTTP requests don't block the event loop, so many
+    lookups can be in flight at once. download_track() drives a browser,
+    so the browser itself runs in a worker thread. Lookups are not cached.
+
+    Use as an async context manager, or call close() when done.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Created on first request so it binds to the running event loop
+        self._aiohttp_session = None
+
+    async def __aenter__(self) -> "AsyncLucidaClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Close the underlying HTTP session"""
+        if self._aiohttp_session is not None:
+            await self._aiohttp_session.close()
+            self._aiohttp_session = None
+
+    async def _get(self, url: str, **kwargs) -> Tuple[str, bytes]:
         """
-        Get list of available streaming services from Lucida.to
+        Rate-limited GET, returning the final URL and response body
+
+        aiohttp errors are re-raised as requests.RequestException so callers
+        handle failures the same way as with LucidaClient.
+        """
+        import aiohttp
+
+        if self._aiohttp_session is None:
+            self._aiohttp_session = aiohttp.ClientSession(
+                headers={"User-Agent": _USER_AGENT},
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+
+        await self.rate_limiter.async_wait()
+
+        try:
+            async with self._aiohttp_session.get(url, **kwargs) as response:
+                self._record_status(
+                    response.status, response.headers.get("Retry-After")
+                )
+                response.raise_for_status()
+                return str(response.url), await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise requests.RequestException(str(e) or type(e).__name__) from e
+
+    async def search(self, query: str, service: str, limit: int = 10) -> Dict[str, Any]:
+        """
+        Search for music on Lucida.to
+
+        Args:
+            query: Search query string
+            service: Music service to search (tidal, qobuz, spotify, deezer, etc.)
+            limit: Maximum number of results to return
 
         Returns:
-            List of service names
+            Dictionary containing search results
         """
-        # Based on Lucida.to documentation
-        return [
-            "tidal",
-            "qobuz",
-            "deezer",
-            "soundcloud",
-            "amazon_music",
-            "yandex_music",
-            "spotify",
-        ]
+        invalid = self._invalid_service_result(query, service)
+        if invalid:
+            return invalid
 
-    def get_rate_limit_stats(self) -> Dict[str, Any]:
+        try:
+            search_url, content = await self._get(
+                f"{self.base_url}/search", params=self._search_params(query, service)
+            )
+            return self._search_result(query, service, search_url, content, limit)
+        except requests.RequestException as e:
+            return self._search_error(query, e)
+
+    async def get_track_info(self, url: str) -> Dict[str, Any]:
         """
-        Get current rate limiter statistics
+        Get detailed information about a track from its URL
+
+        Args:
+            url: URL to the track (from Tidal, Qobuz, etc.)
 
         Returns:
-            Dictionary with rate limit stats and request counts
+            Dictionary containing track information
         """
-        stats = self.rate_limiter.get_stats()
-        return {
-            **stats,
-            "limits": {
-                "per_minute": self.rate_limiter.requests_per_minute,
-                "per_hour": self.rate_limiter.requests_per_hour,
-                "min_delay_seconds": self.rate_limiter.min_delay,
-            },
-        }
+        try:
+            _, content = await self._get(self.base_url, params={"url": url})
+            return self._parse_track_info(url, content)
+        except requests.RequestException as e:
+            return {"error": str(e), "url": url}
+
+    async def download_track(
+        self,
+        url: str,
+        output_path: Optional[str] = None,
+        output_dir: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Download a track from Lucida.to using browser automation
+
+        The rate-limit wait is awaited; the browser itself runs in the
+        default executor.
+        """
+        await self.rate_limiter.async_wait()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, self._download_with_browser, url, output_path, output_dir
+        )